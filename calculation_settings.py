@@ -5,3 +5,8 @@ methods = [
 mining_hem = [
 "14:Metal ores",
 ]
+
+# scenarios that can be requested by name from the HEM worker
+named_scenarios = {
+    "mining_hem": mining_hem,
+}
@@ -1,3 +1,5 @@
+import warnings
+
 import scipy.sparse as sp
 import numpy as np
 
@@ -44,6 +46,36 @@ def get_scenario_matrices(lca, scenario_pairs: dict, direct_skips: set):
     return hem_scenarios, biospheres
 
 
+class PardisoFactorization:
+    """Solver with its own PARDISO factorization of 'matrix', callable like 'scipy.sparse.linalg.factorized'."""
+
+    def __init__(self, matrix):
+        from pypardiso import PyPardisoSolver
+
+        self.matrix = matrix.tocsr()
+        self.pardiso = PyPardisoSolver()
+        self.pardiso.factorize(self.matrix)
+
+    def __call__(self, b):
+        return self.pardiso.solve(self.matrix, b)
+
+    def free(self):
+        """Release the PARDISO memory, the factorization can't be used afterwards."""
+        self.pardiso.free_memory(everything=True)
+
+
+def factorize_technosphere(lca, keep: bool = False):
+    """Set a new 'lca.solver' for the technosphere, with 'keep' also when bw2calc solves with pypardiso."""
+    if hasattr(lca, "solver"):
+        delattr(lca, "solver")
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="PARDISO installed")
+        lca.decompose_technosphere()
+    if keep and not hasattr(lca, "solver"):
+        # bw2calc only sets a solver for SciPy/UMFPACK, pypardiso would re-factorize on every switch of matrix
+        lca.solver = PardisoFactorization(lca.technosphere_matrix)
+
+
 def mlca(lca: LCA, calculation_setup, skip: set = None, progress: bool = False, convenience_print: bool = False,
          result_dict: dict = None, biospheres: dict = None) -> dict[tuple[str, tuple], dict[str, float]]:
     """Simple LCA calculation class to calculate scores for multiple activities and multiple methods.
@@ -128,27 +160,31 @@ def mlca(lca: LCA, calculation_setup, skip: set = None, progress: bool = False,
     pr_time = time.time()  # used for progress indicator timing
     methods = calculation_setup["ia"]
     skip_methods = {method: 0 for method in methods}
-    for i, demand in enumerate(calculation_setup["inv"]):
-        key = list(demand.keys())[0]
-
-        # switch out biospheres for each calculation
-        for bio_name, biosphere in biospheres.items():
-            if key in skip:
-                # shortcut the calculation if we know the result is 0 already
-                result_dict[(key, bio_name)] = skip_methods
-                continue
-            # set new biosphere
-            lca.biosphere_matrix = biosphere
-            # set new inventory
-            lca.redo_lci(demand)
-            # calculate the scores
-            result_dict[(key, bio_name)] = do_lcia(lca, methods)
-
-        # print progress ~every second if enabled
-        if progress and time.time() - pr_time > 1:
-            print_progress(INDICATORS[ind_c])
-            ind_c = (ind_c + 1) % 4
-            pr_time = time.time()
+    try:
+        for i, demand in enumerate(calculation_setup["inv"]):
+            key = list(demand.keys())[0]
+
+            # switch out biospheres for each calculation
+            for bio_name, biosphere in biospheres.items():
+                if key in skip:
+                    # shortcut the calculation if we know the result is 0 already
+                    result_dict[(key, bio_name)] = skip_methods
+                    continue
+                # set new biosphere
+                lca.biosphere_matrix = biosphere
+                # set new inventory
+                lca.redo_lci(demand)
+                # calculate the scores
+                result_dict[(key, bio_name)] = do_lcia(lca, methods)
+
+            # print progress ~every second if enabled
+            if progress and time.time() - pr_time > 1:
+                print_progress(INDICATORS[ind_c])
+                ind_c = (ind_c + 1) % 4
+                pr_time = time.time()
+    finally:
+        # restore original biosphere, also when a calculation failed
+        lca.biosphere_matrix = orig_biosphere
 
     if convenience_print:
         # print final speed
@@ -158,15 +194,15 @@ def mlca(lca: LCA, calculation_setup, skip: set = None, progress: bool = False,
     else:
         print("\r", end="")  # fresh line
 
-    # restore original biosphere
-    lca.biosphere_matrix = orig_biosphere
     return result_dict
 
 
-def techno_mlca(lca, calculation_setup, scenarios: dict, result_dict: dict = None):
+def techno_mlca(lca, calculation_setup, scenarios: dict, result_dict: dict = None, solvers: dict = None):
+    """Calculate scores for every HEM scenario, re-using and filling the factorizations in 'solvers' when given."""
     st_time = time.time()
     orig_technosphere = lca.technosphere_matrix.copy()
     orig_biosphere = lca.biosphere_matrix.copy()
+    orig_solver = getattr(lca, "solver", None)
 
     # find total calculations
     n_scn = len(scenarios)
@@ -179,34 +215,44 @@ def techno_mlca(lca, calculation_setup, scenarios: dict, result_dict: dict = Non
         n_tot_str = f"{round(n_tot / 1e6, 1)}M"
 
     c = 1
-    for sc_name, scenario in scenarios.items():
-        sc_time = time.time()
-        print(f" > run HEM scenario {c}/{n_scn}: '{sc_name[0]}'")
-        new_technosphere, new_biosphere, skip = scenario
-        biosphere_dict = {sc_name: new_biosphere}
-
-        # re-initialize solver
-        if hasattr(lca, "solver"):
+    try:
+        for sc_name, scenario in scenarios.items():
+            sc_time = time.time()
+            print(f" > run HEM scenario {c}/{n_scn}: '{sc_name[0]}'")
+            new_technosphere, new_biosphere, skip = scenario
+            biosphere_dict = {sc_name: new_biosphere}
+
+            lca.technosphere_matrix = new_technosphere
+            if solvers is not None and sc_name in solvers:
+                # re-use the factorization of an earlier run of this scenario
+                lca.solver = solvers[sc_name]
+            else:
+                # re-initialize solver
+                factorize_technosphere(lca, keep=solvers is not None)
+                solver = getattr(lca, "solver", None)
+                if solvers is not None and solver is not None:
+                    solvers[sc_name] = solver
+
+            # get new results
+            result_dict = mlca(lca, calculation_setup, skip,
+                               result_dict=result_dict, biospheres=biosphere_dict)
+
+            sc_time = time.time() - sc_time
+            print(f"   ran {c}/{n_scn} in {round(sc_time, 4)}s @{int(round(n_tot/n_scn/sc_time, 0))} LCA/s")
+            c += 1
+    finally:
+        # restore original matrices and factorization, also when a scenario failed
+        lca.technosphere_matrix = orig_technosphere
+        lca.biosphere_matrix = orig_biosphere
+        if orig_solver is not None:
+            lca.solver = orig_solver
+        elif hasattr(lca, "solver"):
             delattr(lca, "solver")
-        lca.technosphere_matrix = new_technosphere
-        lca.decompose_technosphere()
-
-        # get new results
-        result_dict = mlca(lca, calculation_setup, skip,
-                           result_dict=result_dict, biospheres=biosphere_dict)
-
-        sc_time = time.time() - sc_time
-        print(f"   ran {c}/{n_scn} in {round(sc_time, 4)}s @{int(round(n_tot/n_scn/sc_time, 0))} LCA/s")
-        c += 1
 
     t_diff = time.time() - st_time
     print(f"\r > ran'techno_mlca' in: {round(t_diff, 4)}s | "
           f"{n_tot_str} LCAs finished @{int(round(n_tot / t_diff, 0))} LCA/s")
 
-    # restore original matrices
-    lca.technosphere_matrix = orig_technosphere
-    lca.biosphere_matrix = orig_biosphere
-
     return result_dict
 
 
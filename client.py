@@ -0,0 +1,81 @@
+"""Light client for the HEM worker in `worker.py`.
+
+Only uses the standard library and imports it lazily, so asking a question does not pay for loading
+pandas or Brightway, that is all done once by the worker.
+"""
+HOST = "127.0.0.1"
+PORT = 8765
+
+
+def _request(path: str, data: dict = None, host: str = HOST, port: int = PORT, timeout: float = None) -> dict:
+    import json
+    import urllib.error
+    import urllib.request
+
+    url = f"http://{host}:{port}{path}"
+    body = json.dumps(data).encode("utf-8") if data is not None else None
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read()).get("error", str(e))
+        except ValueError:
+            message = str(e)
+        raise ValueError(f"HEM worker returned {e.code}: {message}") from None
+    except urllib.error.URLError as e:
+        raise ConnectionError(f"No HEM worker reachable at http://{host}:{port} ({e.reason}), "
+                              f"start one with 'python worker.py'") from None
+
+
+def status(host: str = HOST, port: int = PORT) -> dict:
+    """Return the project, database and cached scenarios of the worker."""
+    return _request("/status", host=host, port=port)
+
+
+def query(fu, amount: float = 1, scenario=None, methods: list = None,
+          host: str = HOST, port: int = PORT, timeout: float = None) -> dict:
+    """Ask the worker for the HEM scores of functional unit 'fu'.
+
+    fu: activity key as (database, code)
+    scenario: name of a scenario in 'calculation_settings.named_scenarios' or a list of CPC classes,
+        None for the worker default
+    methods: list of method tuples, None for the worker default
+    """
+    data = {"fu": list(fu), "amount": amount}
+    if scenario is not None:
+        data["scenario"] = scenario
+    if methods is not None:
+        data["methods"] = [list(method) for method in methods]
+    return _request("/query", data, host=host, port=port, timeout=timeout)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Query a running HEM worker.")
+    parser.add_argument("database", nargs="?", help="database of the functional unit, omit to show worker status")
+    parser.add_argument("code", nargs="?", help="code of the functional unit")
+    parser.add_argument("--amount", type=float, default=1)
+    parser.add_argument("--scenario", help="scenario name in calculation_settings or a JSON list of CPC classes")
+    parser.add_argument("--method", action="append", help="method as JSON list, can be repeated")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    if args.database is not None and args.code is None:
+        parser.error("both database and code are required for a query")
+    try:
+        if args.database is None:
+            result = status(args.host, args.port)
+        else:
+            scenario = args.scenario
+            if scenario is not None and scenario.startswith("["):
+                scenario = json.loads(scenario)
+            methods = [json.loads(method) for method in args.method] if args.method else None
+            result = query((args.database, args.code), args.amount, scenario, methods, args.host, args.port)
+    except (ValueError, ConnectionError) as e:
+        parser.exit(1, f"error: {e}\n")
+    print(json.dumps(result, indent=2))
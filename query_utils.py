@@ -0,0 +1,78 @@
+"""Helpers for HEM worker queries that do not need Brightway, so they can be used and tested without it."""
+import math
+
+
+class QueryError(ValueError):
+    """Invalid HEM worker query, answered as a bad request."""
+
+
+def check_query(request) -> dict:
+    """Return the 'HEMWorker.query' arguments of a JSON request, raise QueryError when it is malformed."""
+    if not isinstance(request, dict):
+        raise QueryError("Query must be a JSON object")
+
+    fu = request.get("fu")
+    if not (isinstance(fu, list) and len(fu) == 2 and all(isinstance(k, str) for k in fu)):
+        raise QueryError("Query requires a 'fu' as [database, code]")
+
+    scenario = request.get("scenario")
+    if scenario is not None and not isinstance(scenario, str):
+        to_scenario(scenario)  # raises QueryError when malformed
+
+    methods = request.get("methods")
+    if methods is not None and not (
+            isinstance(methods, list)
+            and all(isinstance(m, list) and len(m) > 0 and all(isinstance(s, str) for s in m) for m in methods)):
+        raise QueryError("Query 'methods' must be a list of methods, each a list of strings")
+
+    return {"fu": fu, "amount": check_amount(request.get("amount", 1)), "scenario": scenario, "methods": methods}
+
+
+def check_amount(amount) -> float:
+    """Return 'amount' when it is a finite number, raise QueryError otherwise (booleans are not accepted)."""
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not math.isfinite(amount):
+        raise QueryError(f"Query 'amount' must be a finite number, not {amount!r}")
+    return amount
+
+
+def to_scenario(scenario: list) -> list:
+    """Convert a JSON scenario definition to the format of 'identify_scenario', lists inside become tuples."""
+    def convert(_scenario):
+        if isinstance(_scenario, str):
+            return _scenario
+        elif isinstance(_scenario, (list, tuple)):
+            return tuple(convert(s) for s in _scenario)
+        elif isinstance(_scenario, dict) and all(isinstance(v, (list, tuple)) for v in _scenario.values()):
+            return {k: [convert(s) for s in v] for k, v in _scenario.items()}
+        raise QueryError(f"Scenario entries must be CPC classes, lists or dicts of lists, not {_scenario!r}")
+
+    if not isinstance(scenario, (list, tuple)) or len(scenario) == 0:
+        raise QueryError(f"Scenario must be a scenario name or a non-empty list of CPC classes, not {scenario!r}")
+    return [convert(s) for s in scenario]
+
+
+def total_scores(all_scores: dict, methods: list) -> list[dict]:
+    """Sum the process contributions of 'mlca' results to one score per method and scenario."""
+    totals = {method: {} for method in methods}
+    for (fu, scenario), results in all_scores.items():
+        for method, scores in results.items():
+            totals[method][scenario] = sum(scores.values()) if isinstance(scores, dict) else scores
+
+    rows = []
+    for method, scores in totals.items():
+        original = scores[("original",)]
+        for scenario, score in scores.items():
+            if scenario[-1] != "remaining":
+                continue
+            sector = scenario[0]
+            direct_remaining = scores.get((sector, "direct_remaining"), original)
+            rows.append({
+                "method": list(method),
+                "scenario": sector,
+                "original": original,
+                "remaining": score,
+                "direct_remaining": direct_remaining,
+                "target": original - score,
+                "direct_target": original - direct_remaining,
+            })
+    return rows
@@ -0,0 +1,131 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+sp = pytest.importorskip("scipy.sparse")
+pytest.importorskip("bw2data")
+pytest.importorskip("bw2calc")
+pytest.importorskip("bw2analyzer")
+
+from scipy.sparse.linalg import factorized, spsolve
+
+from calculations import PardisoFactorization, techno_mlca
+
+A, B = ("db", "a"), ("db", "b")
+METHOD = ("method",)
+SETUP = {"inv": [{A: 1}], "ia": [METHOD]}
+
+
+class FakeLCA:
+    """Two activities where 'a' uses 0.5 'b', with the LCA attributes that 'mlca' and 'techno_mlca' use.
+
+    With 'pardiso' no solver is set by 'decompose_technosphere', as in bw2calc 2.x with pypardiso installed.
+    """
+
+    def __init__(self, pardiso=False):
+        self.pardiso = pardiso
+        self.factorizations = 0
+        self.activity_dict = self.product_dict = {A: 0, B: 1}
+        self.technosphere_matrix = sp.csr_matrix(np.array([[1, 0], [-0.5, 1]]))
+        self.biosphere_matrix = sp.csc_matrix(np.array([[2.0, 4.0]]))
+        self.decompose_technosphere()
+
+    def decompose_technosphere(self):
+        if not self.pardiso:
+            self.factorizations += 1
+            self.solver = factorized(self.technosphere_matrix.tocsc())
+
+    def redo_lci(self, demand):
+        demand_array = np.zeros(2)
+        for key, amount in demand.items():
+            demand_array[self.product_dict[key]] = amount
+        if hasattr(self, "solver"):
+            supply = self.solver(demand_array)
+        else:
+            supply = spsolve(self.technosphere_matrix.tocsc(), demand_array)
+        self.inventory = self.biosphere_matrix @ sp.diags(supply)
+
+    def switch_method(self, method):
+        pass
+
+    def lcia_calculation(self):
+        self.characterized_inventory = sp.csr_matrix(self.inventory)
+
+    def reverse_dict(self):
+        reverse = {v: k for k, v in self.activity_dict.items()}
+        return reverse, reverse, {0: "emission"}
+
+
+def hem_scenarios(lca):
+    """Scenario that removes the input of 'b' into 'a'."""
+    return {("b sector", "remaining"): (sp.csr_matrix(np.eye(2)), lca.biosphere_matrix.copy(), set())}
+
+
+def total(result_dict, scenario):
+    return sum(result_dict[(A, scenario)][METHOD].values())
+
+
+def test_techno_mlca_reuses_and_restores_factorization():
+    lca = FakeLCA()
+    base_solver = lca.solver
+    base_technosphere = lca.technosphere_matrix.copy()
+    solvers = {}
+
+    scores = techno_mlca(lca, SETUP, hem_scenarios(lca), solvers=solvers)
+    assert total(scores, ("b sector", "remaining")) == pytest.approx(2.0)
+    assert list(solvers) == [("b sector", "remaining")]
+    assert lca.factorizations == 2
+
+    # a cached scenario does not factorize again
+    scores = techno_mlca(lca, SETUP, hem_scenarios(lca), solvers=solvers)
+    assert total(scores, ("b sector", "remaining")) == pytest.approx(2.0)
+    assert lca.factorizations == 2
+
+    # the base system is back in place
+    assert lca.solver is base_solver
+    assert (lca.technosphere_matrix != base_technosphere).nnz == 0
+    lca.redo_lci({A: 1})
+    assert lca.inventory.sum() == pytest.approx(4.0)
+
+
+def test_techno_mlca_without_solver():
+    lca = FakeLCA(pardiso=True)
+
+    scores = techno_mlca(lca, SETUP, hem_scenarios(lca))
+    assert total(scores, ("b sector", "remaining")) == pytest.approx(2.0)
+    assert not hasattr(lca, "solver")
+
+
+def test_techno_mlca_keeps_pardiso_factorization():
+    pytest.importorskip("pypardiso")
+    lca = FakeLCA(pardiso=True)
+    solvers = {}
+
+    for _ in range(2):
+        scores = techno_mlca(lca, SETUP, hem_scenarios(lca), solvers=solvers)
+        assert total(scores, ("b sector", "remaining")) == pytest.approx(2.0)
+    [solver] = solvers.values()
+    assert isinstance(solver, PardisoFactorization)
+    assert not hasattr(lca, "solver")
+    solver.free()
+
+
+class FailingLCA(FakeLCA):
+    """Fails to factorize any technosphere after the base one."""
+
+    def decompose_technosphere(self):
+        if self.factorizations:
+            raise MemoryError("no memory for the scenario factorization")
+        super().decompose_technosphere()
+
+
+def test_techno_mlca_restores_after_error():
+    lca = FailingLCA()
+    base_solver = lca.solver
+    base_technosphere = lca.technosphere_matrix.copy()
+    base_biosphere = lca.biosphere_matrix.copy()
+
+    with pytest.raises(MemoryError):
+        techno_mlca(lca, SETUP, hem_scenarios(lca), solvers={})
+    assert lca.solver is base_solver
+    assert (lca.technosphere_matrix != base_technosphere).nnz == 0
+    assert (lca.biosphere_matrix != base_biosphere).nnz == 0
@@ -0,0 +1,87 @@
+import math
+
+import pytest
+
+from query_utils import QueryError, check_amount, check_query, to_scenario, total_scores
+
+METHOD = ("IPCC 2021", "climate change", "GWP100")
+FU = ("db", "fu")
+
+
+@pytest.mark.parametrize("amount", [1, 2.5, -1, 0])
+def test_check_amount_accepts_finite_numbers(amount):
+    assert check_amount(amount) == amount
+
+
+@pytest.mark.parametrize("amount", [None, True, False, "1", math.nan, math.inf, [1]])
+def test_check_amount_rejects_other_values(amount):
+    with pytest.raises(ValueError):
+        check_amount(amount)
+
+
+def test_check_query():
+    request = {"fu": ["db", "fu"], "amount": 2, "scenario": "mining_hem", "methods": [list(METHOD)]}
+    assert check_query(request) == {"fu": ["db", "fu"], "amount": 2, "scenario": "mining_hem",
+                                    "methods": [list(METHOD)]}
+    assert check_query({"fu": ["db", "fu"]}) == {"fu": ["db", "fu"], "amount": 1, "scenario": None, "methods": None}
+
+
+@pytest.mark.parametrize("request_data", [
+    [],
+    {},
+    {"fu": "db|fu"},
+    {"fu": ["db"]},
+    {"fu": ["db", 1]},
+    {"fu": ["db", "fu"], "amount": None},
+    {"fu": ["db", "fu"], "scenario": []},
+    {"fu": ["db", "fu"], "scenario": [14]},
+    {"fu": ["db", "fu"], "methods": "IPCC 2021"},
+    {"fu": ["db", "fu"], "methods": [[]]},
+    {"fu": ["db", "fu"], "methods": [["IPCC 2021", 2021]]},
+])
+def test_check_query_rejects_malformed(request_data):
+    with pytest.raises(QueryError):
+        check_query(request_data)
+
+
+def test_to_scenario_converts_nested_lists_to_tuples():
+    scenario = ["14:Metal ores", ["1:Main", "11:Sub"], {"Group": ["2:A", ["3:B", "31:C"]]}]
+    assert to_scenario(scenario) == [
+        "14:Metal ores",
+        ("1:Main", "11:Sub"),
+        {"Group": ["2:A", ("3:B", "31:C")]},
+    ]
+
+
+@pytest.mark.parametrize("scenario", [[], "14:Metal ores", {"a": ["b"]}, 14, [14], [{"a": "b"}]])
+def test_to_scenario_rejects_non_lists(scenario):
+    with pytest.raises(ValueError):
+        to_scenario(scenario)
+
+
+def test_total_scores():
+    all_scores = {
+        (FU, ("original",)): {METHOD: {("db", "a"): 2.0, ("db", "b"): 3.0}},
+        (FU, ("14:Metal ores", "direct_remaining")): {METHOD: {("db", "a"): 2.0, ("db", "b"): 2.0}},
+        (FU, ("14:Metal ores", "remaining")): {METHOD: {("db", "a"): 1.0, ("db", "b"): 0.5}},
+    }
+    assert total_scores(all_scores, [METHOD]) == [{
+        "method": list(METHOD),
+        "scenario": "14:Metal ores",
+        "original": 5.0,
+        "remaining": 1.5,
+        "direct_remaining": 4.0,
+        "target": 3.5,
+        "direct_target": 1.0,
+    }]
+
+
+def test_total_scores_skipped_fu():
+    # 'mlca' stores 0 instead of process contributions for skipped activities
+    all_scores = {
+        (FU, ("original",)): {METHOD: 0},
+        (FU, ("14:Metal ores", "direct_remaining")): {METHOD: 0},
+        (FU, ("14:Metal ores", "remaining")): {METHOD: 0},
+    }
+    [row] = total_scores(all_scores, [METHOD])
+    assert row["original"] == row["target"] == row["direct_target"] == 0
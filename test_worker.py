@@ -0,0 +1,186 @@
+from http.client import HTTPConnection
+from http.server import HTTPServer
+from types import SimpleNamespace
+import json
+import threading
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("bw2data")
+pytest.importorskip("bw2calc")
+pytest.importorskip("bw2analyzer")
+
+import calculation_settings
+import worker
+from query_utils import QueryError
+
+FU = ("db", "fu")
+METHOD = calculation_settings.methods[0]
+
+
+class FakeLCA:
+    def __init__(self, demand, method):
+        self.activity_dict = {FU: 0}
+        self.biosphere_matrix = ["base biosphere"]
+
+    def lci(self, factorize=False):
+        self.solver = "base solver"
+
+
+class FakeSolver:
+    freed = False
+
+    def free(self):
+        self.freed = True
+
+
+def fake_mlca(lca, calculation_setup, skip=None, biospheres=None, **kwargs):
+    return {(FU, name): {method: {FU: 6.0} for method in calculation_setup["ia"]} for name in biospheres}
+
+
+def fake_techno_mlca(lca, calculation_setup, scenarios, result_dict=None, solvers=None):
+    for name in scenarios:
+        solvers.setdefault(name, FakeSolver())
+        result_dict[(FU, name)] = {method: {FU: 4.0} for method in calculation_setup["ia"]}
+    return result_dict
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Stub Brightway and the scenario functions, return the list of built scenarios."""
+    built = []
+
+    def identify_scenario(df, scenarios, path_dict, assign_other=True):
+        return df, [s for s in scenarios if s != "99:Nothing"]
+
+    def get_scenario_data(df, scenarios, progress=False):
+        built.append(scenarios)
+        return {(s, "remaining"): [] for s in scenarios}, set()
+
+    def get_scenario_matrices(lca, scenario_pairs, direct_skips):
+        hem_scenarios = {name: ("technosphere", "biosphere", direct_skips) for name in scenario_pairs}
+        biospheres = {("original",): "biosphere copy"}
+        biospheres.update({(name[0], "direct_remaining"): "biosphere" for name in scenario_pairs})
+        return hem_scenarios, biospheres
+
+    monkeypatch.setattr(worker, "bd", SimpleNamespace(
+        projects=SimpleNamespace(set_current=lambda project: None),
+        databases={"db"},
+        methods={METHOD},
+        get_activity=lambda key: f"activity {key}",
+    ))
+    monkeypatch.setattr(worker, "bc", SimpleNamespace(lca=SimpleNamespace(LCA=FakeLCA)))
+    monkeypatch.setattr(worker, "get_cpc_tree", lambda: {})
+    monkeypatch.setattr(worker, "load_bw_2_pd", lambda db_name: pd.DataFrame({"key": [FU]}))
+    monkeypatch.setattr(worker, "unpack_classifications", lambda df, systems: df)
+    monkeypatch.setattr(worker, "identify_scenario", identify_scenario)
+    monkeypatch.setattr(worker, "get_scenario_data", get_scenario_data)
+    monkeypatch.setattr(worker, "get_scenario_matrices", get_scenario_matrices)
+    monkeypatch.setattr(worker, "mlca", fake_mlca)
+    monkeypatch.setattr(worker, "techno_mlca", fake_techno_mlca)
+    return built
+
+
+@pytest.mark.parametrize("cache_size, expected", [(-1, 1), (0, 1), (1, 1), (3, 3)])
+def test_cache_size_bounds(builds, cache_size, expected):
+    assert worker.HEMWorker("project", "db", cache_size).cache_size == expected
+
+
+def test_scenario_cache_lru(builds):
+    hem_worker = worker.HEMWorker("project", "db", cache_size=2)
+    a = hem_worker.get_scenario(["1:A"])
+    hem_worker.get_scenario(["2:B"])
+    assert hem_worker.get_scenario(["1:A"]) is a  # hit, moves 'A' to most recently used
+    assert builds == [["1:A"], ["2:B"]]
+
+    a["solvers"][("1:A", "remaining")] = FakeSolver()
+    b_solver = FakeSolver()
+    hem_worker.get_scenario(["2:B"])["solvers"][("2:B", "remaining")] = b_solver
+    hem_worker.get_scenario(["3:C"])  # evicts 'A'
+    assert hem_worker.status()["cached_scenarios"] == [["2:B"], ["3:C"]]
+    assert builds == [["1:A"], ["2:B"], ["3:C"]]
+
+    hem_worker.get_scenario(["1:A"])  # rebuilt, evicts 'B'
+    assert hem_worker.status()["cached_scenarios"] == [["3:C"], ["1:A"]]
+    assert b_solver.freed
+    assert len(builds) == 4
+
+
+def test_scenario_cache_shares_base_biosphere(builds):
+    hem_worker = worker.HEMWorker("project", "db")
+    for scenario in (["1:A"], ["2:B"]):
+        assert hem_worker.get_scenario(scenario)["biospheres"][("original",)] is hem_worker.base_biosphere
+
+
+def test_query_named_scenario(builds):
+    hem_worker = worker.HEMWorker("project", "db")
+    result = hem_worker.query(list(FU), scenario="mining_hem")
+    assert result["scores"] == [{
+        "method": list(METHOD),
+        "scenario": calculation_settings.mining_hem[0],
+        "original": 6.0,
+        "remaining": 4.0,
+        "direct_remaining": 6.0,
+        "target": 2.0,
+        "direct_target": 0.0,
+    }]
+    assert hem_worker.status()["cached_scenarios"] == [calculation_settings.mining_hem]
+    assert hem_worker.status()["cached_factorizations"] == 1
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"scenario": "methods"},
+    {"scenario": ["99:Nothing"]},
+    {"methods": [["unknown", "method"]]},
+    {"fu": ["db", "unknown"]},
+])
+def test_query_errors(builds, kwargs):
+    hem_worker = worker.HEMWorker("project", "db")
+    with pytest.raises(QueryError):
+        hem_worker.query(**{"fu": list(FU), **kwargs})
+    assert hem_worker.status()["cached_scenarios"] == []
+
+
+@pytest.fixture
+def post(builds):
+    """Serve a worker on a free port, return a function that posts a body and returns the status and response."""
+    server = HTTPServer(("127.0.0.1", 0), worker.make_handler(worker.HEMWorker("project", "db")))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def _post(body):
+        connection = HTTPConnection(*server.server_address)
+        connection.request("POST", "/query", body=body if isinstance(body, str) else json.dumps(body))
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    yield _post
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("body, status", [
+    ({"fu": list(FU)}, 200),
+    ({"fu": list(FU), "scenario": ["1:A"], "amount": 2.5}, 200),
+    ("not json", 400),
+    ([], 400),
+    ({"fu": "db|fu"}, 400),
+    ({"fu": list(FU), "amount": None}, 400),
+    ({"fu": list(FU), "amount": True}, 400),
+    ({"fu": list(FU), "scenario": "methods"}, 400),
+    ({"fu": list(FU), "scenario": ["99:Nothing"]}, 400),
+    ({"fu": list(FU), "methods": [["unknown", "method"]]}, 400),
+])
+def test_handler_status(post, body, status):
+    assert post(body)[0] == status
+
+
+@pytest.mark.parametrize("error", [KeyError(("db", "missing")), ValueError("bad matrix"), MemoryError()])
+def test_handler_internal_errors(post, monkeypatch, error):
+    def failing_matrices(*args):
+        raise error
+
+    monkeypatch.setattr(worker, "get_scenario_matrices", failing_matrices)
+    status, response = post({"fu": list(FU)})
+    assert status == 500
+    assert response["error"].startswith(type(error).__name__)
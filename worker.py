@@ -0,0 +1,197 @@
+"""Long-lived HEM worker that keeps Brightway data and factorizations in memory and answers queries over local HTTP."""
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import argparse
+import json
+import traceback
+
+import bw2data as bd
+import bw2calc as bc
+
+import calculation_settings
+from calculations import PardisoFactorization, get_scenario_matrices, mlca, techno_mlca
+from loading_data import load_bw_2_pd, unpack_classifications, get_cpc_tree, identify_scenario, get_scenario_data
+from query_utils import QueryError, check_query, to_scenario, total_scores
+from utils import *
+
+PROJECT = "ei311 hem"
+DB_NAME = "ecoinvent-3.11-cutoff"
+CLASSIFICATIONS = ["CPC"]
+HOST = "127.0.0.1"
+PORT = 8765
+CACHE_SIZE = 4
+
+
+class HEMWorker:
+    """Keep the loaded LCA object, base factorization, CPC data and recent scenario factorizations in memory."""
+
+    def __init__(self, project: str = PROJECT, db_name: str = DB_NAME, cache_size: int = CACHE_SIZE):
+        st_time = time.time()
+        self.project = project
+        self.db_name = db_name
+        self.cache_size = max(cache_size, 1)
+        self.scenario_cache = OrderedDict()  # scenario definition -> prepared scenario data, one entry per definition
+
+        bd.projects.set_current(project)
+        if db_name not in bd.databases:
+            raise ValueError(f"Database {db_name} not found in project {project}")
+
+        self.CPC_tree = get_cpc_tree()
+        df = load_bw_2_pd(db_name)
+        self.df = unpack_classifications(df, CLASSIFICATIONS)
+
+        # initialize LCA object with the base factorization, any activity of the database can be the FU afterwards
+        self.lca = bc.lca.LCA(demand={self.df["key"].iloc[0]: 1}, method=calculation_settings.methods[0])
+        self.lca.lci(factorize=True)
+        if not hasattr(self.lca, "solver"):
+            # pypardiso sets no solver, keep a dedicated factorization of the base technosphere
+            self.lca.solver = PardisoFactorization(self.lca.technosphere_matrix)
+        if hasattr(self.lca, "remap_inventory_dicts"):
+            # bw2calc 2.x indexes by node id, the HEM functions use (database, code) keys
+            self.lca.remap_inventory_dicts()
+        self.base_biosphere = self.lca.biosphere_matrix.copy()  # shared by all cached scenarios
+        print(f" > HEM worker ready in: {time_format(time.time() - st_time)}")
+
+    def status(self) -> dict:
+        return {
+            "project": self.project,
+            "database": self.db_name,
+            "activities": len(self.df),
+            "cache_size": self.cache_size,
+            "cached_scenarios": [json.loads(key) for key in self.scenario_cache.keys()],
+            "cached_factorizations": sum(len(prepared["solvers"]) for prepared in self.scenario_cache.values()),
+        }
+
+    def get_scenario(self, scenario: list) -> dict:
+        """Return the prepared matrices and factorizations for 'scenario', building them when not cached."""
+        key = json.dumps(scenario, sort_keys=True)
+        if key in self.scenario_cache:
+            self.scenario_cache.move_to_end(key)
+            return self.scenario_cache[key]
+
+        df, scenarios = identify_scenario(self.df.copy(), to_scenario(scenario), self.CPC_tree, assign_other=False)
+        if len(scenarios) == 0:
+            raise QueryError(f"Scenario {scenario} does not match any activity in database {self.db_name}")
+        scenario_pairs, direct_skips = get_scenario_data(df, scenarios=scenarios)
+        if len(scenario_pairs) == 0:
+            raise QueryError(f"Scenario {scenario} has no exchanges to extract in database {self.db_name}")
+        hem_scenarios, biospheres = get_scenario_matrices(self.lca, scenario_pairs, direct_skips)
+        biospheres[("original",)] = self.base_biosphere  # don't keep a copy of the base biosphere per entry
+        prepared = {
+            "hem_scenarios": hem_scenarios,
+            "biospheres": biospheres,
+            "direct_skips": direct_skips,
+            "solvers": {},  # filled by 'techno_mlca' on first use
+        }
+
+        self.scenario_cache[key] = prepared
+        while len(self.scenario_cache) > self.cache_size:
+            _, evicted = self.scenario_cache.popitem(last=False)  # evict least recently used scenario
+            for solver in evicted["solvers"].values():
+                if hasattr(solver, "free"):
+                    solver.free()  # PARDISO memory is not released by garbage collection
+        return prepared
+
+    def query(self, fu, amount: float = 1, scenario=None, methods: list = None) -> dict:
+        """Calculate the default, direct and HEM scores of a functional unit for a scenario and methods.
+
+        fu: activity key as [database, code]
+        scenario: name of a scenario in 'calculation_settings.named_scenarios' or a list of CPC classes,
+            nested lists are read as tuples as in 'identify_scenario'
+        methods: list of method tuples, defaults to 'calculation_settings.methods'
+        """
+        fu = tuple(fu)
+        if fu not in self.lca.activity_dict:
+            raise QueryError(f"Activity {fu} not found in database {self.db_name}")
+
+        if scenario is None:
+            scenario = calculation_settings.mining_hem
+        elif isinstance(scenario, str):
+            if scenario not in calculation_settings.named_scenarios:
+                raise QueryError(f"Scenario '{scenario}' not found, options are: "
+                                 f"{', '.join(calculation_settings.named_scenarios)}")
+            scenario = calculation_settings.named_scenarios[scenario]
+
+        methods = [tuple(method) for method in methods] if methods else calculation_settings.methods
+        for method in methods:
+            if method not in bd.methods:
+                raise QueryError(f"Method {method} not found in project {self.project}")
+
+        calculation_setup = {"inv": [{fu: amount}], "ia": methods}
+        prepared = self.get_scenario(scenario)
+
+        all_scores = mlca(self.lca, calculation_setup,
+                          biospheres=prepared["biospheres"], skip=prepared["direct_skips"])
+        all_scores = techno_mlca(self.lca, calculation_setup, scenarios=prepared["hem_scenarios"],
+                                 result_dict=all_scores, solvers=prepared["solvers"])
+        return {
+            "fu": list(fu),
+            "activity": str(bd.get_activity(fu)),
+            "amount": amount,
+            "scores": total_scores(all_scores, methods),
+        }
+
+
+def make_handler(worker: HEMWorker):
+    class HEMRequestHandler(BaseHTTPRequestHandler):
+        def send_json(self, status: int, data: dict):
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/status":
+                self.send_json(200, worker.status())
+            else:
+                self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/query":
+                self.send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+            try:
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    raise QueryError("Query must be a JSON object") from None
+                result = worker.query(**check_query(request))
+            except QueryError as e:
+                self.send_json(400, {"error": str(e)})
+                return
+            except Exception as e:
+                # keep the worker alive and answer, the LCA object is restored by 'mlca' and 'techno_mlca'
+                traceback.print_exc()
+                self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+                return
+            self.send_json(200, result)
+
+    return HEMRequestHandler
+
+
+def serve(worker: HEMWorker, host: str = HOST, port: int = PORT):
+    """Answer queries until interrupted, requests are handled one at a time as they share the LCA object."""
+    server = HTTPServer((host, port), make_handler(worker))
+    print(f"+ HEM worker listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a warm HEM worker with a local query API.")
+    parser.add_argument("--project", default=PROJECT)
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE,
+                        help="number of scenario definitions to keep in memory")
+    args = parser.parse_args()
+
+    serve(HEMWorker(args.project, args.db, args.cache_size), args.host, args.port)